@@ -1,16 +1,22 @@
 import asyncio
-import json
+import hashlib
 import random
+import re
 import time
-from typing import Dict, List, Any
-
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set, Union
+
+import msgspec
+import numpy as np
+from numba import njit
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
 
 
-app = FastAPI(title="Carousel-Only Demo Platform")
+app = FastAPI(title="Carousel-Only Demo Platform", default_response_class=ORJSONResponse)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -71,52 +77,203 @@ STOCKS = [
 ]
 
 
+# ---------- WebSocket messages ----------
+# Encoded with msgspec structs rather than dicts + stdlib json; the wire format is still JSON.
+class TickMsg(msgspec.Struct):
+    primary_value: str
+    secondary_value: str
+    updated_at: int
+
+
+class SubscribeMsg(msgspec.Struct, tag_field="type", tag="subscribe"):
+    item_ids: Optional[List[str]] = None
+
+
+class SubscribedMsg(msgspec.Struct, tag_field="type", tag="subscribed"):
+    item_ids: List[str]
+
+
+class UpdateMsg(msgspec.Struct, tag_field="type", tag="update"):
+    data: Dict[str, TickMsg]
+
+
+ws_encoder = msgspec.json.Encoder()
+ws_decoder = msgspec.json.Decoder(SubscribeMsg)
+
+
 # ---------- Live value state (for WebSocket updates) ----------
-# We'll update primary/secondary values continuously, per item.id
-LIVE: Dict[str, Dict[str, Any]] = {}
+# Items are interned to int ids at startup (templates, then hotels, then stocks) and all
+# internal state is indexed by id; string ids only appear at the serialization boundary.
+ITEM_IDS: List[str] = [x["id"] for x in TEMPLATES + HOTELS + STOCKS]
+ITEM_ID: Dict[str, int] = {item_id: i for i, item_id in enumerate(ITEM_IDS)}
+
+N_TEMPLATES = len(TEMPLATES)
+N_HOTELS = len(HOTELS)
+N_STOCKS = len(STOCKS)
+TEMPLATE_ROWS = slice(0, N_TEMPLATES)
+HOTEL_ROWS = slice(N_TEMPLATES, N_TEMPLATES + N_HOTELS)
+STOCK_ROWS = slice(N_TEMPLATES + N_HOTELS, len(ITEM_IDS))
+
+# We'll update primary/secondary values continuously, per item id
+LIVE: List[TickMsg] = [TickMsg(primary_value="-", secondary_value="-", updated_at=0) for _ in ITEM_IDS]
+
+# Numeric state lives in NumPy arrays (one row per catalog entry) and is drawn from a
+# single Generator, so a tick is a few C-level fills instead of per-item random calls.
+# LIVE only holds the formatted view.
+RNG = np.random.default_rng()
+
+TEMPLATE_USES = np.zeros(N_TEMPLATES, dtype=np.int64)
+
+STOCK_LTP = np.empty(N_STOCKS, dtype=np.float64)
+STOCK_PREV_CLOSE = np.empty(N_STOCKS, dtype=np.float64)
+STOCK_DAY_HIGH = np.empty(N_STOCKS, dtype=np.float64)
+STOCK_DAY_LOW = np.empty(N_STOCKS, dtype=np.float64)
+STOCK_CHANGE_PCT = np.zeros(N_STOCKS, dtype=np.float64)
+STOCK_VOL = np.zeros(N_STOCKS, dtype=np.int64)
+
+
+def publish_templates(now: int):
+    growth = RNG.integers(1, 30, N_TEMPLATES, endpoint=True)
+    LIVE[TEMPLATE_ROWS] = [
+        TickMsg(primary_value=f"{uses:,} uses", secondary_value=f"+{g}% this week", updated_at=now)
+        for uses, g in zip(TEMPLATE_USES.tolist(), growth.tolist())
+    ]
+
+
+def publish_hotels(now: int):
+    prices = RNG.integers(1800, 12000, N_HOTELS, endpoint=True)
+    discounts = RNG.integers(5, 40, N_HOTELS, endpoint=True)
+    LIVE[HOTEL_ROWS] = [
+        TickMsg(primary_value=f"₹{price}/night", secondary_value=f"{off}% off", updated_at=now)
+        for price, off in zip(prices.tolist(), discounts.tolist())
+    ]
+
+
+# Compiled eagerly (explicit signature) at import, so the first tick doesn't stall the loop
+@njit("void(f8[:], f8[:], f8[:], f8[:], f8[:], i8[:], f8[:], i8[:])", cache=True, fastmath=True)
+def tick_kernel(ltp, prev_close, day_high, day_low, change_pct, vol, drifts, vol_adds):
+    # One fused in-place pass over the stock arrays; no NumPy temporaries
+    for i in range(ltp.shape[0]):
+        new = ltp[i] + drifts[i]
+        if new < 1.0:
+            new = 1.0
+        ltp[i] = new
+        if new > day_high[i]:
+            day_high[i] = new
+        if new < day_low[i]:
+            day_low[i] = new
+        change_pct[i] = (new - prev_close[i]) / prev_close[i] * 100
+        vol[i] += vol_adds[i]
+
+
+def tick_stocks():
+    drifts = RNG.uniform(-2.5, 2.5, N_STOCKS)
+    vol_adds = RNG.integers(100, 8000, N_STOCKS, endpoint=True)
+    tick_kernel(STOCK_LTP, STOCK_PREV_CLOSE, STOCK_DAY_HIGH, STOCK_DAY_LOW, STOCK_CHANGE_PCT, STOCK_VOL, drifts, vol_adds)
+
+
+def publish_stocks(now: int):
+    # Format display strings from the arrays only when publishing. Every row is reformatted
+    # every tick: with +/-2.5 drift the displayed paise and basis-point values change on
+    # ~99.8% of ticks, so a last-value cache would cost more than the formatting it skips.
+    LIVE[STOCK_ROWS] = [
+        TickMsg(primary_value=f"₹{price:.2f}", secondary_value=f"{pct:+.2f}%", updated_at=now)
+        for price, pct in zip(STOCK_LTP.tolist(), STOCK_CHANGE_PCT.tolist())
+    ]
 
 
 def init_live_state():
+    now = int(time.time())
+
     # Templates: "Uses today"
-    for t in TEMPLATES:
-        LIVE[t["id"]] = {
-            "primary_value": f"{random.randint(1_000, 50_000)} uses",
-            "secondary_value": f"+{random.randint(1, 30)}% this week",
-            "updated_at": int(time.time()),
-        }
+    TEMPLATE_USES[:] = RNG.integers(1_000, 50_000, N_TEMPLATES, endpoint=True)
+    publish_templates(now)
 
     # Hotels: "Price per night"
-    for h in HOTELS:
-        price = random.randint(1800, 12000)
-        LIVE[h["id"]] = {
-            "primary_value": f"₹{price}/night",
-            "secondary_value": f"{random.randint(5, 40)}% off",
-            "updated_at": int(time.time()),
-        }
-
-    # Stocks: "Price"
-    for s in STOCKS:
-        price = random.uniform(200, 3500)
-        LIVE[s["id"]] = {
-            "primary_value": f"₹{price:.2f}",
-            "secondary_value": f"{random.uniform(-2.5, 2.5):+.2f}%",
-            "updated_at": int(time.time()),
-        }
+    publish_hotels(now)
+
+    # Stocks: "Price" and change vs previous close
+    STOCK_LTP[:] = RNG.uniform(200, 3500, N_STOCKS)
+    STOCK_PREV_CLOSE[:] = STOCK_LTP / (1 + RNG.uniform(-2.5, 2.5, N_STOCKS) / 100)
+    STOCK_DAY_HIGH[:] = STOCK_LTP
+    STOCK_DAY_LOW[:] = STOCK_LTP
+    STOCK_CHANGE_PCT[:] = (STOCK_LTP - STOCK_PREV_CLOSE) / STOCK_PREV_CLOSE * 100
+    publish_stocks(now)
+
+
+# ---------- Pre-encoded snapshots ----------
+# Encoded once per engine tick and shared by every connection, instead of each socket
+# building and encoding its own copy. Each tick yields a plain JSON text frame and a
+# raw-DEFLATE binary frame for clients that connected with ?enc=deflate-raw.
+# The deflated frame is only a win when uvicorn runs with --ws-per-message-deflate false
+# (as the Dockerfile does); otherwise permessage-deflate compresses it again per socket.
+GLOBAL_SNAPSHOT_TEXT: str = ""
+GLOBAL_SNAPSHOT_BYTES: bytes = b""
+
+# Common subscription subsets, keyed by (frozenset of int item ids, deflated); cleared on each tick
+SUBSET_CACHE_SIZE = 32
+_subset_cache: "OrderedDict[tuple, Union[str, bytes]]" = OrderedDict()
+
+# Set on every publish; broadcast_engine waits on it and clears it, so a tick that lands
+# mid-broadcast triggers another pass with the newest frame instead of being lost
+tick_ready = asyncio.Event()
+
+
+def deflate(buf: bytes) -> bytes:
+    # Raw DEFLATE (no zlib header), finished per frame so each one inflates on its own
+    c = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return c.compress(buf) + c.flush()
+
+
+def ws_frame(msg: msgspec.Struct, deflated: bool) -> Union[str, bytes]:
+    # Text frame with plain JSON, or binary frame with raw-DEFLATE compressed JSON
+    buf = ws_encoder.encode(msg)
+    return deflate(buf) if deflated else buf.decode()
+
+
+def publish_snapshot():
+    global GLOBAL_SNAPSHOT_TEXT, GLOBAL_SNAPSHOT_BYTES
+    buf = ws_encoder.encode(UpdateMsg(data=dict(zip(ITEM_IDS, LIVE))))
+    GLOBAL_SNAPSHOT_TEXT = buf.decode()
+    GLOBAL_SNAPSHOT_BYTES = deflate(buf)
+    _subset_cache.clear()
+    tick_ready.set()
+
+
+def snapshot_for(subscribed: frozenset, deflated: bool) -> Union[str, bytes]:
+    # subscribed only holds valid ids, so equal size means everything
+    if len(subscribed) == len(LIVE):
+        return GLOBAL_SNAPSHOT_BYTES if deflated else GLOBAL_SNAPSHOT_TEXT
+
+    key = (subscribed, deflated)
+    buf = _subset_cache.get(key)
+    if buf is not None:
+        _subset_cache.move_to_end(key)
+        return buf
+
+    snap = {ITEM_IDS[i]: LIVE[i] for i in subscribed}
+    buf = ws_frame(UpdateMsg(data=snap), deflated)
+    _subset_cache[key] = buf
+    if len(_subset_cache) > SUBSET_CACHE_SIZE:
+        _subset_cache.popitem(last=False)
+    return buf
 
 
 init_live_state()
+publish_snapshot()
 
 
 def build_item(base: Dict[str, Any], actions: List[Dict[str, str]], extra_meta: Dict[str, Any] | None = None) -> Dict[str, Any]:
-    live = LIVE.get(base["id"], {})
+    i = ITEM_ID.get(base["id"])
+    live = LIVE[i] if i is not None else None
     return {
         "id": base["id"],
         "title": base["title"],
         "subtitle": base["subtitle"],
         "image": None,
         "badges": base.get("badges", []),
-        "primary_value": live.get("primary_value", "-"),
-        "secondary_value": live.get("secondary_value", "-"),
+        "primary_value": live.primary_value if live else "-",
+        "secondary_value": live.secondary_value if live else "-",
         "actions": actions,
         "metadata": extra_meta or {},
     }
@@ -132,139 +289,264 @@ def carousel(carousel_id: str, title: str, subtitle: str, items: List[Dict[str,
     }
 
 
-class ChatRequest(BaseModel):
+# Request bodies are decoded and validated by msgspec rather than Pydantic models
+class ChatRequest(msgspec.Struct):
     message: str
 
 
+class ActionRequest(msgspec.Struct):
+    item_id: Any = None
+    action: Any = None
+
+
+chat_decoder = msgspec.json.Decoder(ChatRequest)
+action_decoder = msgspec.json.Decoder(ActionRequest)
+
+
+async def decode_body(request: Request, decoder: msgspec.json.Decoder):
+    try:
+        return decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# One precompiled alternation per intent, checked in priority order
+INTENT_PATTERNS = [
+    ("templates", re.compile(r"template|design|canva|poster|resume|logo|story")),
+    ("hotels", re.compile(r"hotel|booking|stay|room|goa|mumbai|delhi|bangalore|bengaluru|jaipur")),
+    ("stocks", re.compile(r"stock|price|buy|sell|nse|reliance|tcs|hdfc|infy|itc")),
+]
+
+
 def route_intent(message: str) -> str:
     q = (message or "").strip().lower()
-    # very simple intent routing for demo
-    if any(k in q for k in ["template", "design", "canva", "poster", "resume", "logo", "story"]):
-        return "templates"
-    if any(k in q for k in ["hotel", "booking", "stay", "room", "goa", "mumbai", "delhi", "bangalore", "bengaluru", "jaipur"]):
-        return "hotels"
-    if any(k in q for k in ["stock", "price", "buy", "sell", "nse", "reliance", "tcs", "hdfc", "infy", "itc"]):
-        return "stocks"
-    if any(k in q for k in ["all", "everything", "explore", "discover"]):
-        return "all"
+    # very simple intent routing for demo; "all", "explore", etc. fall through to the default
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(q):
+            return intent
     return "all"
 
 
+# Card actions are shared, read-only constants rather than rebuilt per request
+TEMPLATE_ACTIONS = [{"label": "Use", "action": "USE_TEMPLATE"}, {"label": "Preview", "action": "PREVIEW"}]
+HOTEL_ACTIONS = [{"label": "Book", "action": "BOOK"}, {"label": "Save", "action": "SAVE"}]
+STOCK_ACTIONS = [{"label": "Buy", "action": "BUY"}, {"label": "Sell", "action": "SELL"}]
+
+# Reusable index permutations for sample_k, one per catalog
+_TEMPLATE_IDX = list(range(N_TEMPLATES))
+_HOTEL_IDX = list(range(N_HOTELS))
+_STOCK_IDX = list(range(N_STOCKS))
+
+# (intent, catalog, index scratch, actions, (carousel_id, title, subtitle)), in display order
+CATALOGS = [
+    ("templates", TEMPLATES, _TEMPLATE_IDX, TEMPLATE_ACTIONS, ("templates", "Templates", "Pick a starting point (carousel-only)")),
+    ("hotels", HOTELS, _HOTEL_IDX, HOTEL_ACTIONS, ("hotels", "Stays & Deals", "Demo hotel cards (carousel-only)")),
+    ("stocks", STOCKS, _STOCK_IDX, STOCK_ACTIONS, ("stocks", "Market Watch", "Demo live tickers (random)")),
+]
+
+
+def sample_k(items: List[Any], k: int, idx_scratch: List[int]) -> List[Any]:
+    # Partial Fisher-Yates over a persistent permutation of indices: k swaps, no set or
+    # pool allocation. The scratch stays a permutation, so every call is still uniform.
+    n = len(items)
+    for i in range(k):
+        j = random.randrange(i, n)
+        idx_scratch[i], idx_scratch[j] = idx_scratch[j], idx_scratch[i]
+    return [items[idx_scratch[i]] for i in range(k)]
+
+
+# The page is read once at import; in debug mode it is re-read per request so edits show up
+INDEX_HTML_PATH = Path("static/index.html")
+
+
+def html_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+INDEX_HTML_BYTES = INDEX_HTML_PATH.read_bytes()
+INDEX_HTML_ETAG = html_etag(INDEX_HTML_BYTES)
+
+
 @app.get("/", response_class=HTMLResponse)
-def home():
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return f.read()
+async def home(request: Request):
+    body, etag = INDEX_HTML_BYTES, INDEX_HTML_ETAG
+    if app.debug:
+        body = INDEX_HTML_PATH.read_bytes()
+        etag = html_etag(body)
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(body, headers={"ETag": etag})
 
 
 @app.post("/api/chat")
-def chat(req: ChatRequest):
+async def chat(request: Request):
+    req: ChatRequest = await decode_body(request, chat_decoder)
     intent = route_intent(req.message)
 
-    carousels: List[Dict[str, Any]] = []
-
-    if intent in ("templates", "all"):
-        items = [
-            build_item(t, actions=[{"label": "Use", "action": "USE_TEMPLATE"}, {"label": "Preview", "action": "PREVIEW"}])
-            for t in random.sample(TEMPLATES, k=min(5, len(TEMPLATES)))
-        ]
-        carousels.append(carousel("templates", "Templates", "Pick a starting point (carousel-only)", items))
-
-    if intent in ("hotels", "all"):
-        items = [
-            build_item(h, actions=[{"label": "Book", "action": "BOOK"}, {"label": "Save", "action": "SAVE"}])
-            for h in random.sample(HOTELS, k=min(5, len(HOTELS)))
-        ]
-        carousels.append(carousel("hotels", "Stays & Deals", "Demo hotel cards (carousel-only)", items))
-
-    if intent in ("stocks", "all"):
-        items = [
-            build_item(s, actions=[{"label": "Buy", "action": "BUY"}, {"label": "Sell", "action": "SELL"}])
-            for s in random.sample(STOCKS, k=min(5, len(STOCKS)))
-        ]
-        carousels.append(carousel("stocks", "Market Watch", "Demo live tickers (random)", items))
+    carousels = [
+        carousel(cid, title, subtitle, [
+            build_item(x, actions)
+            for x in sample_k(catalog, min(5, len(catalog)), idx)
+        ])
+        for key, catalog, idx, actions, (cid, title, subtitle) in CATALOGS
+        if intent in (key, "all")
+    ]
 
     assistant_text = "Showing carousels based on your request. (Demo data, live updates via WebSocket.)"
 
-    return {"assistant_text": assistant_text, "carousels": carousels}
+    # Returning the response directly skips FastAPI's jsonable_encoder pass
+    return ORJSONResponse({"assistant_text": assistant_text, "carousels": carousels})
 
 
 @app.post("/api/action")
-def action(payload: Dict[str, Any]):
+async def action(request: Request):
     """
     Demo action handler for card buttons.
     In real apps, this triggers workflows: create design, book hotel, place order, etc.
     """
-    item_id = payload.get("item_id")
-    action_name = payload.get("action")
-    return {
+    payload: ActionRequest = await decode_body(request, action_decoder)
+    item_id = payload.item_id
+    action_name = payload.action
+    return ORJSONResponse({
         "ok": True,
         "message": f"Action '{action_name}' received for item '{item_id}' (demo)."
-    }
+    })
 
 
 # ---------- WebSocket "live" updater ----------
+BROADCAST_BATCH = 50
+SEND_QUEUE_SIZE = 64
+
+
+class ConnState:
+    """Per-connection state for an open /ws/live socket."""
+
+    def __init__(self, ws: WebSocket, deflated: bool):
+        self.ws = ws
+        # Client opted into raw-DEFLATE binary frames (?enc=deflate-raw)
+        self.deflated = deflated
+        self.subscribed: frozenset = frozenset()
+        # Outgoing frames; drained by one long-lived task per socket
+        self.send_q: "asyncio.Queue[Union[str, bytes]]" = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+
+    def enqueue(self, buf: Union[str, bytes]):
+        # A slow consumer loses its oldest frame rather than holding up everyone else
+        if self.send_q.full():
+            self.send_q.get_nowait()
+        self.send_q.put_nowait(buf)
+
+
+# Every accepted socket; broadcast_engine fans each tick out to these
+ACTIVE_CONNS: Set[ConnState] = set()
+
+
+async def broadcast_batched(conns: Set[ConnState]):
+    targets = [c for c in conns if c.subscribed]
+    for i in range(0, len(targets), BROADCAST_BATCH):
+        for conn in targets[i:i + BROADCAST_BATCH]:
+            conn.enqueue(snapshot_for(conn.subscribed, conn.deflated))
+        # Yield between batches so a large fan-out doesn't stall other requests
+        await asyncio.sleep(0)
+
+
+async def _ws_drain(state: ConnState):
+    while True:
+        buf = await state.send_q.get()
+        if isinstance(buf, str):
+            await state.ws.send_text(buf)
+        else:
+            await state.ws.send_bytes(buf)
+
+
+async def _ws_reader(ws: WebSocket, state: ConnState):
+    while True:
+        # Frames are decoded straight from bytes; text frames are still accepted
+        message = await ws.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        raw = message.get("bytes") or message.get("text") or b""
+        try:
+            data = ws_decoder.decode(raw)
+        except msgspec.DecodeError:
+            # Malformed or non-subscribe message: ignore it
+            continue
+
+        requested = data.item_ids or []
+        # Validate once with a set intersection; per-tick paths then need no membership checks
+        state.subscribed = frozenset(ITEM_ID[i] for i in ITEM_ID.keys() & requested)
+        state.enqueue(ws_frame(SubscribedMsg(item_ids=[ITEM_IDS[i] for i in state.subscribed]), state.deflated))
+        # Push current values right away instead of waiting for the next tick
+        if state.subscribed:
+            state.enqueue(snapshot_for(state.subscribed, state.deflated))
+
+
 async def live_engine():
     while True:
+        # One clock read per tick, shared by every item
+        now = int(time.time())
+
         # Templates: uses and growth
-        for t in TEMPLATES:
-            v = LIVE[t["id"]]
-            uses = int(v["primary_value"].split()[0].replace(",", ""))
-            uses += random.randint(0, 120)
-            v["primary_value"] = f"{uses:,} uses"
-            v["secondary_value"] = f"+{random.randint(1, 30)}% this week"
-            v["updated_at"] = int(time.time())
+        TEMPLATE_USES[:] += RNG.integers(0, 120, N_TEMPLATES, endpoint=True)
+        publish_templates(now)
 
         # Hotels: price and discount wiggle
-        for h in HOTELS:
-            price = random.randint(1800, 12000)
-            LIVE[h["id"]] = {
-                "primary_value": f"₹{price}/night",
-                "secondary_value": f"{random.randint(5, 40)}% off",
-                "updated_at": int(time.time()),
-            }
+        publish_hotels(now)
 
         # Stocks: price + percent
-        for s in STOCKS:
-            old = float(LIVE[s["id"]]["primary_value"].replace("₹", ""))
-            new = max(1.0, old + random.uniform(-2.5, 2.5))
-            pct = random.uniform(-2.5, 2.5)
-            LIVE[s["id"]]["primary_value"] = f"₹{new:.2f}"
-            LIVE[s["id"]]["secondary_value"] = f"{pct:+.2f}%"
-            LIVE[s["id"]]["updated_at"] = int(time.time())
+        tick_stocks()
+        publish_stocks(now)
 
+        publish_snapshot()
         await asyncio.sleep(0.6)
 
 
+async def broadcast_engine():
+    # Keeps fan-out bookkeeping out of live_engine; enqueueing is cheap (put_nowait plus a
+    # yield per batch) and the drain tasks do the sends. Frames are immutable bytes, so
+    # publishing a new one never disturbs a broadcast still enqueueing the previous one.
+    while True:
+        await tick_ready.wait()
+        tick_ready.clear()
+        await broadcast_batched(ACTIVE_CONNS)
+
+
 @app.on_event("startup")
 async def on_startup():
     asyncio.create_task(live_engine())
+    asyncio.create_task(broadcast_engine())
 
 
 @app.websocket("/ws/live")
 async def ws_live(ws: WebSocket):
     """
-    Client subscribes with:
+    Client subscribes with (text or binary frame):
       {"type":"subscribe","item_ids":["tpl_ig_post","stk_TCS",...]}
-    Server pushes:
-      {"type":"update","data": {"item_id": {"primary_value":"...", "secondary_value":"..."} } }
+    Server acks with:
+      {"type":"subscribed","item_ids":[...]}
+    and then pushes:
+      {"type":"update","data": {"item_id": {"primary_value":"...", "secondary_value":"...", "updated_at": 0} } }
+
+    Server frames are JSON text frames by default. Connecting with ?enc=deflate-raw
+    switches every server frame, the ack included, to a binary frame holding raw DEFLATE
+    (no zlib header), one self-contained stream per frame, with the JSON inside.
     """
     await ws.accept()
-    subscribed: List[str] = []
-
+    state = ConnState(ws, deflated=ws.query_params.get("enc") == "deflate-raw")
+
+    def drain_done(task: asyncio.Task):
+        # A failed send ends the drain task; stop broadcasting to this socket.
+        # The reader sees the disconnect itself, so the send error is only retrieved.
+        ACTIVE_CONNS.discard(state)
+        if not task.cancelled():
+            task.exception()
+
+    drain = asyncio.create_task(_ws_drain(state))
+    drain.add_done_callback(drain_done)
+    ACTIVE_CONNS.add(state)
     try:
-        while True:
-            try:
-                msg = await asyncio.wait_for(ws.receive_text(), timeout=0.25)
-                data = json.loads(msg)
-                if data.get("type") == "subscribe":
-                    requested = data.get("item_ids") or []
-                    subscribed = [i for i in requested if i in LIVE]
-                    await ws.send_text(json.dumps({"type": "subscribed", "item_ids": subscribed}))
-            except asyncio.TimeoutError:
-                pass
-
-            if subscribed:
-                snap = {i: LIVE[i] for i in subscribed if i in LIVE}
-                await ws.send_text(json.dumps({"type": "update", "data": snap}))
+        await _ws_reader(ws, state)
     except WebSocketDisconnect:
         return
+    finally:
+        drain.cancel()